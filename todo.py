@@ -1,49 +1,117 @@
 import streamlit as st
-from pymongo import MongoClient
+import pandas as pd
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import os
 from dotenv import load_dotenv
 from bson.objectid import ObjectId  # To handle MongoDB document IDs
 from bcrypt import hashpw, gensalt, checkpw
 import re
-import time
+import html
+import datetime
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
 # Load environment variables from the .env file
 load_dotenv()
 
-# Singleton connection for MongoDB
-def initialize_database():
-    if "db_client" not in st.session_state:
-        try:
-            client = MongoClient(
-                os.getenv("MONGO_CONNECTION_STRING"), serverSelectionTimeoutMS=5000
-            )
-            client.admin.command('ping')  # Test connection
-            st.session_state["db_client"] = client
-        except Exception as e:
-            st.error("Failed to connect to the database. Please try again later.")
-            st.stop()
-    
-    return st.session_state["db_client"].get_database("todo_app")
+logger = logging.getLogger(__name__)
+
+# Singleton connection for MongoDB, shared by every session in the process
+@st.cache_resource
+def get_client():
+    client = MongoClient(
+        os.getenv("MONGO_CONNECTION_STRING"),
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=20,           # Sized for this app's concurrency
+        minPoolSize=2,
+        w=1,                      # Acknowledge writes from the primary only
+        retryWrites=True,
+        compressors="zstd,zlib",  # zlib is the fallback when zstandard is not installed
+    )
+    client.admin.command('ping')  # Test connection
+    create_indexes(client.get_database("todo_app"))
+    return client
+
+# Raised when a unique index that enforces usernames / task titles cannot be built
+class IndexCreationError(Exception):
+    pass
+
+# Create the indexes backing the per-user queries (only once per process)
+def create_indexes(db):
+    # Includes every field get_tasks returns (plus _id) so listing tasks is a covered query.
+    # It is only a speedup, so the app keeps running without it.
+    try:
+        db["tasks"].create_index([
+            ("user_id", 1), ("completed", 1), ("title", 1), ("due_date", 1), ("description", 1), ("_id", 1)
+        ])
+    except OperationFailure as e:
+        logger.error("Could not create the covering index on tasks: %s", e)
+
+    # add_task and create_user rely on these to reject duplicates, so they are required
+    # (existing duplicate rows must be cleaned up before they can be built)
+    try:
+        db["tasks"].create_index([("user_id", 1), ("title", 1)], unique=True)
+        db["users"].create_index("username", unique=True)
+    except OperationFailure as e:
+        raise IndexCreationError(str(e)) from e
+
+# bcrypt work factor for new password hashes (the library default is 12)
+BCRYPT_ROUNDS = 10
+
+# Shared worker pool for bcrypt hashing. This is a throttle, not a speedup: callers still wait
+# for the result, but at most cpu_count hashes run at once across all sessions
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
 
 # Usage
-db = initialize_database()
-if db is not None:
-    users_collection = db["users"]
-    tasks_collection = db["tasks"]
-else:
+try:
+    db = get_client().get_database("todo_app")
+except IndexCreationError as e:
+    logger.error("Could not create the unique indexes: %s", e)
+    st.error("Database indexes could not be created. Please contact the administrator.")
+    st.stop()
+except Exception as e:
+    logger.exception("Failed to connect to the database: %s", e)
+    st.error("Failed to connect to the database. Please try again later.")
     st.stop()  # Stop the app if the database connection fails
 
+users_collection = db["users"]
+tasks_collection = db["tasks"]
+
 # Session state: Initialize user authentication
 if "user_id" not in st.session_state:
     st.session_state["user_id"] = None
 
+# Session state: Show a toast queued before the last st.rerun()
+if "toast_message" in st.session_state:
+    st.toast(st.session_state.pop("toast_message"))
+
+# Per-user task list versions, shared by every session in the process like the get_tasks cache
+@st.cache_resource
+def get_tasks_versions():
+    return {"counter": itertools.count(1), "versions": {}}
+
+def tasks_version(user_oid):
+    return get_tasks_versions()["versions"].get(user_oid, 0)
+
+# Bumped on every task mutation to invalidate the cached task list in all of the user's sessions
+def bump_tasks_version(user_oid):
+    tasks_versions = get_tasks_versions()
+    tasks_versions["versions"][user_oid] = next(tasks_versions["counter"])
+
 # Function to authenticate users
 def authenticate_user(username, password):
     user = users_collection.find_one({"username": username})
-    if user and checkpw(password.encode('utf-8'), user["password"]):
+    if user and get_executor().submit(checkpw, password.encode('utf-8'), user["password"]).result():
         return str(user["_id"])
     return None
 
 
+# Password policy regex, compiled once at import
+PASSWORD_RE = re.compile(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()\-_+={}[\]|\\:;"\'<>,.?/~`])[A-Za-z\d!@#$%^&*()\-_+={}[\]|\\:;"\'<>,.?/~`]{8,}$')
+
 # Function to validate the password
 def is_valid_password(password):
     """
@@ -54,61 +122,140 @@ def is_valid_password(password):
     - At least one special character
     - Minimum length of 8 characters
     """
-    pattern = r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()\-_+={}[\]|\\:;"\'<>,.?/~`])[A-Za-z\d!@#$%^&*()\-_+={}[\]|\\:;"\'<>,.?/~`]{8,}$'
-    return re.match(pattern, password) is not None
+    return PASSWORD_RE.match(password) is not None
 
 # Function to create a new user
 def create_user(username, password):
-    if users_collection.find_one({"username": username}):
-        return False  # Username already exists
-    hashed_password = hashpw(password.encode('utf-8'), gensalt())
-    users_collection.insert_one({"username": username, "password": hashed_password})
-    return True
-
-# Retrieve all tasks for the logged-in user
-def get_tasks(user_id):
+    hashed_password = get_executor().submit(hashpw, password.encode('utf-8'), gensalt(rounds=BCRYPT_ROUNDS)).result()
+    try:
+        result = users_collection.insert_one({"username": username, "password": hashed_password})
+    except DuplicateKeyError:
+        return None  # Username already exists (enforced by the unique index)
+    return str(result.inserted_id)
+
+# Retrieve all tasks for the logged-in user (cached until the version changes)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_tasks(user_oid, version):
     return list(tasks_collection.find(
-        {"user_id": ObjectId(user_id)},
+        {"user_id": user_oid},
         {"title": 1, "description": 1, "due_date": 1, "completed": 1}
     ))
     
 # Add a new task to the database
-def add_task(user_id, title, description, due_date):
-    existing_task = tasks_collection.find_one({"user_id": ObjectId(user_id), "title": title})
-    if existing_task:
+def add_task(user_oid, title, description, due_date):
+    try:
+        tasks_collection.insert_one({
+            "user_id": user_oid,  # Link task to the logged-in user
+            "title": title,
+            "description": description,
+            "due_date": datetime.datetime.combine(due_date, datetime.time.min),  # Stored as a BSON date
+            "completed": False,         # Tasks are incomplete by default
+        })
+    except DuplicateKeyError:
+        # Titles are unique per user via the (user_id, title) index
         st.error("Task with this title already exists.")
         return
-    tasks_collection.insert_one({
-        "user_id": ObjectId(user_id),  # Link task to the logged-in user
-        "title": title,
-        "description": description,
-        "due_date": str(due_date),  # Convert date object to string
-        "completed": False,         # Tasks are incomplete by default
-    })
+    bump_tasks_version(user_oid)
     st.success("Task added successfully!")  # Success message after task is added
 
-# Delete a specific task by its ID
-def delete_task(task_id):
-    tasks_collection.delete_one({"_id": ObjectId(task_id)})
-    st.success("Task deleted successfully!")  # Success message after task deletion
-    st.rerun()
+# Format a due date for display (older tasks stored it as a string)
+def format_due_date(due_date):
+    if isinstance(due_date, datetime.datetime):
+        return due_date.strftime("%Y-%m-%d")
+    return due_date
+
+# Apply the edits made in the task editor: delete flagged tasks and save completion changes
+def apply_task_edits(task_ids, editor_key):
+    edited_rows = st.session_state[editor_key]["edited_rows"]
+    deletes = []
+    updates = []
+    for row, changes in edited_rows.items():
+        if changes.get("delete"):
+            deletes.append(task_ids[row])
+        elif "completed" in changes:
+            # Only writes if the stored value actually differs
+            updates.append(UpdateOne(
+                {"_id": task_ids[row], "completed": {"$ne": changes["completed"]}},
+                {"$set": {"completed": changes["completed"]}},
+            ))
+    if deletes:
+        tasks_collection.delete_many({"_id": {"$in": deletes}})
+        st.toast("Task deleted successfully!")  # Success message after task deletion
+    if updates:
+        # Updates are independent, so let the server apply them unordered in one round-trip
+        tasks_collection.bulk_write(updates, ordered=False)
+    if deletes or updates:
+        bump_tasks_version(st.session_state["user_oid"])
 
 # Clear all completed tasks for the logged-in user
-def clear_completed_tasks(user_id):
-    completed_tasks = tasks_collection.count_documents({"user_id": ObjectId(user_id), "completed": True})
-
-    if completed_tasks > 0:
-        tasks_collection.delete_many({"user_id": ObjectId(user_id), "completed": True})
-        st.success("All completed tasks have been cleared.")
-        time.sleep(1)
-        st.rerun()
+def clear_completed_tasks(user_oid):
+    result = tasks_collection.delete_many({"user_id": user_oid, "completed": True})
+
+    if result.deleted_count > 0:
+        bump_tasks_version(user_oid)
+        st.toast("All completed tasks have been cleared.")
     else:
-        st.info("There are no completed tasks to clear.")
+        st.toast("There are no completed tasks to clear.")
 
 def logout():
     st.session_state.clear()
     st.success("You have been logged out.")
-    
+
+# Task list, progress and actions; interactions here rerun only this fragment
+@st.fragment
+def render_tasks():
+    version = tasks_version(st.session_state["user_oid"])
+    tasks = get_tasks(st.session_state["user_oid"], version)  # Fetch tasks for the logged-in user
+
+    total_tasks = len(tasks)
+    completed_tasks = sum(1 for task in tasks if task["completed"])
+
+    if total_tasks > 0:
+        st.markdown("### Task Completion Progress")
+        st.progress(completed_tasks / total_tasks)
+    else:
+        st.info("No tasks found. Start adding tasks to see your progress!")
+
+    if tasks:
+        # Styled task details, built into one markdown block
+        task_html = []
+        for task in tasks:
+            style = "text-decoration: line-through; color: gray;" if task["completed"] else ""
+            # A blank line would end the HTML block and break every task after it
+            description = html.escape(task["description"]).replace("\n", "<br>")
+            task_html.append(
+                f"<div style='{style} margin-bottom: 10px;'><b style= 'font-size: 1.2rem'>{html.escape(task['title'])}</b>"
+                f"<br>{description}<br>Due: {format_due_date(task['due_date'])}</div>"
+            )
+        st.markdown("".join(task_html), unsafe_allow_html=True)
+
+        # Task actions in one editable table; edits are saved by apply_task_edits before the next run
+        task_ids = [task["_id"] for task in tasks]
+        tasks_df = pd.DataFrame({
+            "title": [task["title"] for task in tasks],
+            "completed": [task["completed"] for task in tasks],
+            "delete": False,
+        })
+        # A new key whenever the task list changes, so stale row edits are discarded
+        editor_key = f"tasks_editor_{version}"
+        st.data_editor(
+            tasks_df,
+            column_config={
+                "title": st.column_config.TextColumn("Title"),
+                "completed": st.column_config.CheckboxColumn("Mark Complete"),
+                "delete": st.column_config.CheckboxColumn("Delete"),
+            },
+            disabled=["title"],
+            hide_index=True,
+            use_container_width=True,
+            key=editor_key,
+            on_change=apply_task_edits,
+            args=(task_ids, editor_key),
+        )
+
+    st.markdown("---")
+    # Clear completed tasks
+    st.button("Clear Completed Tasks", on_click=clear_completed_tasks, args=(st.session_state["user_oid"],))
 
 
 # App title
@@ -131,8 +278,8 @@ if st.session_state["user_id"] is None:
                 user_id = authenticate_user(username, password)
                 if user_id:
                     st.session_state["user_id"] = user_id  # Set session user ID
-                    st.success("Logged in successfully!")
-                    time.sleep(1)
+                    st.session_state["user_oid"] = ObjectId(user_id)  # Parsed once for queries
+                    st.session_state["toast_message"] = "Logged in successfully!"  # Shown after the rerun
                     st.rerun()
                 else:
                     st.error("Invalid credentials.")
@@ -147,11 +294,11 @@ if st.session_state["user_id"] is None:
                 st.error("Password must include at least 8 characters, one uppercase letter, one lowercase letter, one number, and one special character.")
 
             else:
-                if create_user(username, password):
-                    user = users_collection.find_one({"username": username})
-                    st.session_state["user_id"] = str(user["_id"])
-                    st.success("User created! Log in now.")
-                    time.sleep(1)
+                user_id = create_user(username, password)
+                if user_id:
+                    st.session_state["user_id"] = user_id
+                    st.session_state["user_oid"] = ObjectId(user_id)
+                    st.session_state["toast_message"] = "Account created! You are now logged in."
                     st.rerun()
                 else:
                     st.error("Username already exists.")
@@ -171,7 +318,7 @@ else:
         
         if submit_button:
             if title.strip():  # Ensure title is not empty
-                add_task(st.session_state["user_id"], title.strip(), description, due_date)
+                add_task(st.session_state["user_oid"], title.strip(), description, due_date)
                 
             else:
                 st.sidebar.error("Task Title is required!")
@@ -181,56 +328,4 @@ else:
 
     # Display user tasks
     st.header("Your Tasks📄")
-    
-
-    tasks = get_tasks(st.session_state["user_id"])  # Fetch tasks for the logged-in user
-
-
-    total_tasks = len(tasks)
-    completed_tasks = sum(1 for task in tasks if task["completed"])
-
-    if total_tasks > 0:
-        st.markdown("### Task Completion Progress")
-        st.progress(completed_tasks / total_tasks)
-    else:
-        st.info("No tasks found. Start adding tasks to see your progress!")
-        
-
-
-    for task in tasks:
-        # Task details and action buttons
-        col1, col2, col3 = st.columns([4, 1, 1])
-        with col1:
-            # Styled task details
-            style = "text-decoration: line-through; color: gray;" if task["completed"] else ""
-            st.markdown(
-                f"<div style='{style}'><b style= 'font-size: 1.2rem'>{task['title']}</b><br>{task['description']}<br>Due: {task['due_date']}</div>",
-                unsafe_allow_html=True
-            )      
-
-        with col2:
-                # Mark task as complete
-            is_checked = st.checkbox("Mark Complete", value=task["completed"], key=str(task["_id"]))
-
-            if is_checked != task["completed"]:
-                tasks_collection.update_one(
-                        {"_id": ObjectId(task["_id"])},
-                        {"$set": {"completed": is_checked}},
-                    )
-                st.rerun()
-                
-               
-                    
-        with col3:
-            # Delete task
-            if st.button("Delete", key=f"delete_{task['_id']}"):
-                delete_task(task["_id"])
-
-        # Add space after each task (margin-bottom)
-        st.markdown(f"""
-    <div style="margin-bottom: 10px;"></div>""", unsafe_allow_html=True)  # Adds space between tasks        
-    
-    st.markdown("---")
-    # Clear completed tasks
-    if st.button("Clear Completed Tasks"):
-        clear_completed_tasks(st.session_state["user_id"])
+    render_tasks()